@@ -1,17 +1,171 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
-import requests
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, flash
+from jinja2 import FileSystemBytecodeCache
+import httpx
+from http.cookiejar import DefaultCookiePolicy
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from cachetools import LRUCache, TTLCache
 from datetime import datetime
 from functools import wraps
+import hashlib
+import json
 import os
+import secrets
+import threading
+import time
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)  # Required for Flask sessions
+# Required for Flask sessions. Read it from the environment so every worker
+# (and every restart) signs sessions with the same key. The checked-in key is
+# only used by the `python app.py` debug server; anywhere else a missing
+# FLASK_SECRET_KEY falls back to a random per-process key.
+FLASK_SECRET_KEY = os.environ.get("FLASK_SECRET_KEY")
+if FLASK_SECRET_KEY:
+    app.secret_key = FLASK_SECRET_KEY.encode()
+elif __name__ == "__main__":
+    app.secret_key = b"ambalearn-dev-only-secret"
+else:
+    app.logger.warning(
+        "FLASK_SECRET_KEY is not set; using a random key, so sessions won't survive "
+        "restarts or be shared between workers"
+    )
+    app.secret_key = secrets.token_bytes(32)
+
+# Keep sessions in Redis when it's configured: the browser then only sends a
+# session id, and logging out deletes the session for every worker at once.
+# Without REDIS_URL we stay on Flask's signed-cookie sessions.
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    import redis
+    from flask_session import Session
+
+    app.config["SESSION_TYPE"] = "redis"
+    app.config["SESSION_REDIS"] = redis.Redis(
+        connection_pool=redis.BlockingConnectionPool.from_url(REDIS_URL, max_connections=64)
+    )
+    app.config["SESSION_KEY_PREFIX"] = "ambalearn:"
+    Session(app)
+
+# Share compiled templates between workers and restarts, and compile them all
+# now so no user pays for it on a first render. Template auto-reload stays
+# tied to debug mode (Flask's default), so production never re-checks them.
+# Without JINJA_CACHE_DIR, Jinja picks a per-user 0700 temp directory and
+# verifies its ownership, so other local users can't plant bytecode in it.
+JINJA_CACHE_DIR = os.environ.get("JINJA_CACHE_DIR")
+if JINJA_CACHE_DIR:
+    os.makedirs(JINJA_CACHE_DIR, mode=0o700, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+else:
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+for template_name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template_name)
 
 # --- IMPORTANT ---
-# This URL must be the public-facing address of your *backend* machine.
-# The one you provided is perfect.
-API_BASE_URL = "http://localhost:8080"
-MEDIAPIPE_BASE_URL = "http://localhost:5001"
+# API_BASE_URL must be the public-facing address of your *backend* machine,
+# MEDIAPIPE_BASE_URL the proctoring socket used by the exam page.
+# Set them per deployment through the environment.
+API_BASE_URL = os.environ.get("API_BASE_URL", "http://localhost:8080")
+MEDIAPIPE_BASE_URL = os.environ.get("MEDIAPIPE_BASE_URL", "http://localhost:5001")
+
+# Backend paths with parameters, relative to API_BASE_URL
+COURSE_PATH = "/course/{u}"
+COURSE_STEP_CHAT_PATH = "/course/{u}/step/{s}/chat"
+COURSE_EXAM_PATH = "/course/{u}/exam"
+COURSE_EXAM_SUBMIT_PATH = "/course/{u}/exam/submit"
+GET_SESSION_PATH = "/get_session/{uid}"
+LESSON_BUNDLE_PATH = "/page/lesson_step/{u}/{s}"
+
+# One pooled HTTP/2 client shared by every request: concurrent upstream calls
+# are multiplexed over the same keep-alive connection instead of each paying
+# a TCP/TLS handshake. Timeouts are 2s to connect and 10s to read by default;
+# LLM-backed endpoints pass LLM_TIMEOUT for a longer read.
+API_TIMEOUT = httpx.Timeout(10.0, connect=2.0)
+LLM_TIMEOUT = httpx.Timeout(30.0, connect=2.0)
+
+_HTTP = httpx.Client(
+    base_url=API_BASE_URL,
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+    ),
+    timeout=API_TIMEOUT,
+    # ApiSession.request follows redirects itself; httpx would drop the user's cookies on each hop
+    follow_redirects=False,
+)
+# It must never remember cookies itself: each user's cookies are sent per call.
+_HTTP.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+# Everything an upstream call can raise: transport/HTTP errors, or a body that isn't JSON
+API_ERRORS = (httpx.HTTPError, json.JSONDecodeError)
+
+class BackendUnavailable(httpx.TransportError):
+    """Raised instead of calling the backend while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """
+    Counts consecutive upstream failures; after fail_max of them calls fail
+    fast for reset_timeout seconds, then the next call is let through to
+    probe the backend. The lock only guards the counters, never the call
+    itself, so upstream calls still run concurrently.
+    """
+
+    def __init__(self, fail_max, reset_timeout):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout:
+                raise BackendUnavailable("Backend unavailable: circuit breaker is open")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+
+# Stop calling the backend for a while once it keeps failing, so a dead
+# backend fails requests fast instead of tying up every worker.
+_BREAKER = CircuitBreaker(fail_max=5, reset_timeout=15)
+
+# Worker threads for upstream calls that can run side by side
+_POOL = ThreadPoolExecutor(max_workers=8)
+# Fire-and-forget calls (e.g. backend logout) get their own threads, so a burst
+# of them against a slow backend can't starve the sidebar's fetches in _POOL
+_BACKGROUND_POOL = ThreadPoolExecutor(max_workers=4)
+SIDEBAR_TIMEOUT = 5  # seconds to wait for each sidebar call before rendering without it
+
+# Sidebar data per user, kept briefly so back-to-back renders skip the network.
+# The TTL is short because chat history changes; chat routes also invalidate it.
+_SIDEBAR_CACHE = TTLCache(maxsize=10_000, ttl=10)
+_SIDEBAR_STALE = LRUCache(maxsize=10_000)  # last good sidebar, shown while the backend is down
+_SIDEBAR_LOCK = threading.Lock()
+
+# Course structure rarely changes, so keep it for a minute. The stale copy
+# outlives the TTL and is served when the backend can't be reached.
+_COURSE_CACHE = TTLCache(maxsize=5_000, ttl=60)
+_COURSE_STALE = LRUCache(maxsize=5_000)
+_COURSE_LOCK = threading.RLock()
+
+# Upstream fetches currently running, so concurrent identical ones wait for
+# the first instead of all hitting the backend (e.g. when a cache entry expires)
+_IN_FLIGHT = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+# Whether the backend offers POST /create_session_with_message; flipped off on first 404/405
+_COMBINED_NEW_CHAT = True
+
+# Whether the backend offers GET /page/lesson_step/<course_uid>/<step>; flipped off on a 405,
+# or on a 404 for a course and step that the individual calls show do exist
+_LESSON_BUNDLE = True
 
 # --- Authentication & API Session ---
 
@@ -27,8 +181,8 @@ def login_required(f):
         api = get_api_session()
         try:
             # We use a lightweight call to check validity
-            response = api.get(f"{API_BASE_URL}/@me")
-            if not response.ok:
+            response = api.get("/@me")
+            if not response.is_success:
                 session.clear()
                 flash("Session expired. Please log in again.", "error")
                 return redirect(url_for('login'))
@@ -38,68 +192,254 @@ def login_required(f):
             from flask import g
             g.user = response.json()
 
-        except requests.exceptions.RequestException:
-             session.clear()
-             flash("Connection error. Please log in.", "error")
-             return redirect(url_for('login'))
+        except API_ERRORS:
+            # The backend is unreachable (or the breaker is open), which says nothing
+            # about this user's session: keep it, so a refresh works once it's back
+            flash("Could not reach the server. Please try again in a moment.", "error")
+            return render_template('login.html'), 503
 
         return f(*args, **kwargs)
     return decorated_function
 
+class ApiSession:
+    """Per-user view of the shared pool: sends the stored API cookies on every call"""
+
+    def __init__(self, cookies=None):
+        self.cookies = dict(cookies or {})
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, stream=False, **kwargs):
+        # build_request + send rather than _HTTP.request(), which deprecates per-request cookies
+        api_request = _HTTP.build_request(method, url, cookies=self.cookies, **kwargs)
+        _BREAKER.before_call()
+        try:
+            response = _HTTP.send(api_request, stream=stream)
+            redirects = 0
+            while response.next_request is not None:
+                next_request = response.next_request
+                response.close()
+                if redirects == _HTTP.max_redirects:
+                    raise httpx.TooManyRedirects("Exceeded maximum allowed redirects.", request=next_request)
+                redirects += 1
+                # Re-send the user's cookies, but only to the backend itself
+                if next_request.url.netloc == api_request.url.netloc:
+                    httpx.Cookies(self.cookies).set_cookie_header(next_request)
+                response = _HTTP.send(next_request, stream=stream)
+        except httpx.TransportError as e:
+            # A slow LLM reply isn't a sign the backend is down
+            if not (isinstance(e, httpx.ReadTimeout) and kwargs.get('timeout') is LLM_TIMEOUT):
+                _BREAKER.record_failure()
+            raise
+        _BREAKER.record_success()
+        return response
+
 def get_api_session():
-    """Creates a requests.Session and loads stored cookies"""
-    api_session = requests.Session()
-    if 'api_cookies' in session:
-        api_session.cookies.update(session['api_cookies'])
-    return api_session
+    """Returns an ApiSession carrying the user's stored cookies"""
+    return ApiSession(session.get('api_cookies'))
+
+def proxy_response(resp):
+    """Streams an upstream response back to the browser without parsing it"""
+    response = Response(
+        resp.iter_bytes(8192),
+        status=resp.status_code,
+        content_type=resp.headers.get('content-type', 'application/json')
+    )
+    response.call_on_close(resp.close)
+    return response
+
+def raise_for_stream_status(resp):
+    """raise_for_status() for a streamed response, handing its connection back to the pool on error"""
+    if resp.is_error:
+        resp.close()
+    resp.raise_for_status()
+
+def cookie_key(cookies):
+    """Stable cache key for a user's API cookies"""
+    raw = json.dumps(cookies or {}, sort_keys=True).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def single_flight(key, fetch):
+    """Runs fetch() once per key at a time; concurrent callers share its result or exception"""
+    with _IN_FLIGHT_LOCK:
+        future = _IN_FLIGHT.get(key)
+        leader = future is None
+        if leader:
+            future = _IN_FLIGHT[key] = Future()
+    if not leader:
+        return future.result()
+
+    try:
+        result = fetch()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _IN_FLIGHT_LOCK:
+            del _IN_FLIGHT[key]
+
+def _cache_course(key, course_data):
+    """Stores course data with its {step_number: step} index; returns the cached pair"""
+    entry = (course_data, {step['step_number']: step for step in course_data.get('steps', [])})
+    with _COURSE_LOCK:
+        _COURSE_CACHE[key] = _COURSE_STALE[key] = entry
+    return entry
 
 def get_course_data(api, course_uid):
-    """Helper function to get course data"""
+    """
+    Helper function to get (course_data, steps_by_number), cached per user
+    for a minute. Returns (None, {}) when the course can't be loaded.
+    """
+    key = (cookie_key(api.cookies), course_uid)
+    with _COURSE_LOCK:
+        cached = _COURSE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    def fetch():
+        resp = api.get(COURSE_PATH.format(u=course_uid))
+        resp.raise_for_status()
+        return _cache_course(key, resp.json())
+
+    try:
+        return single_flight(("course", *key), fetch)
+    except API_ERRORS:
+        # Backend trouble: fall back to the last copy we saw, if any
+        with _COURSE_LOCK:
+            return _COURSE_STALE.get(key, (None, {}))
+
+def get_lesson_bundle(api, course_uid, step_number):
+    """
+    Fetches everything the lesson page needs in one backend call:
+    {me, sessions, course, step_chat}, where step_chat is null until the
+    lesson is started. Primes the course and sidebar caches with it and
+    returns (course_data, steps_by_number, history), history being None
+    if not started.
+    Returns None when the bundle isn't available, so callers fall back to
+    the individual calls (which also report a missing course or step).
+    """
+    global _LESSON_BUNDLE
+    if not _LESSON_BUNDLE:
+        return None
     try:
-        resp = api.get(f"{API_BASE_URL}/course/{course_uid}")
+        resp = api.get(LESSON_BUNDLE_PATH.format(u=course_uid, s=step_number))
+        if resp.status_code == 404:
+            # Either the course/step doesn't exist or this backend predates the
+            # bundle endpoint. If the course and step turn out to exist, it's
+            # the route that is missing, so stop asking for it.
+            _, steps_by_number = get_course_data(api, course_uid)
+            if step_number in steps_by_number:
+                _LESSON_BUNDLE = False
+            return None
+        if resp.status_code == 405:
+            _LESSON_BUNDLE = False
+            return None
         resp.raise_for_status()
-        return resp.json()
-    except requests.exceptions.RequestException:
+        bundle = resp.json()
+    except API_ERRORS:
         return None
 
+    key = cookie_key(api.cookies)
+    course_data = bundle.get('course')
+    course_data, steps_by_number = _cache_course((key, course_uid), course_data) if course_data else (None, {})
+    if bundle.get('me'):
+        # The sidebar request that follows the page render is then served from cache
+        with _SIDEBAR_LOCK:
+            _SIDEBAR_CACHE[key] = _SIDEBAR_STALE[key] = (bundle['me'], bundle.get('sessions', []))
+
+    step_chat = bundle.get('step_chat')
+    return course_data, steps_by_number, (step_chat.get('history', []) if step_chat is not None else None)
+
+def invalidate_course(course_uid=None):
+    """Drops the current user's cached course (or all their courses when no uid is given)"""
+    user_key = cookie_key(session.get('api_cookies'))
+    with _COURSE_LOCK:
+        for cache in (_COURSE_CACHE, _COURSE_STALE):
+            for key in list(cache.keys()):
+                if key[0] == user_key and course_uid in (None, key[1]):
+                    cache.pop(key, None)
+
+def _fetch_sidebar(api):
+    """Fetches (user_info, chat_history) for the sidebar, served from a short-lived cache"""
+    key = cookie_key(api.cookies)
+    with _SIDEBAR_LOCK:
+        cached = _SIDEBAR_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    def fetch():
+        # Fire both sidebar calls at once so the request waits max(t1, t2) instead of t1 + t2
+        user_future = _POOL.submit(api.get, "/@me")
+        chat_future = _POOL.submit(api.get, "/list_sessions")
+
+        # /@me also validates the session: an expired one gets an empty sidebar
+        user_resp = user_future.result(timeout=SIDEBAR_TIMEOUT)
+        if not user_resp.is_success:
+            return None, []
+        user_info = user_resp.json()
+
+        chat_resp = chat_future.result(timeout=SIDEBAR_TIMEOUT)
+        chat_history = chat_resp.json().get('sessions', []) if chat_resp.is_success else []
+
+        with _SIDEBAR_LOCK:
+            _SIDEBAR_CACHE[key] = _SIDEBAR_STALE[key] = (user_info, chat_history)
+        return user_info, chat_history
+
+    return single_flight(("sidebar", key), fetch)
+
+def _stale_sidebar(api):
+    """Last sidebar we rendered for this user, or the logged-out defaults"""
+    with _SIDEBAR_LOCK:
+        return _SIDEBAR_STALE.get(cookie_key(api.cookies), (None, []))
+
+def invalidate_sidebar():
+    """Drops the current user's cached sidebar so the next render refetches it"""
+    if 'api_cookies' in session:
+        key = cookie_key(session['api_cookies'])
+        with _SIDEBAR_LOCK:
+            _SIDEBAR_CACHE.pop(key, None)
+            _SIDEBAR_STALE.pop(key, None)
+        # Pages request /api/sidebar?u=<user>&v=<version>, so bumping it also skips the browser's cached copy
+        session['sidebar_version'] = session.get('sidebar_version', 0) + 1
+
 @app.context_processor
 def inject_global_data():
-    """Injects data into all templates (for the sidebar)"""
-    if 'api_cookies' in session:
-        # Check if we already fetched the user in login_required
-        from flask import g
-        user_info = getattr(g, 'user', None)
+    """Injects data into all templates. The sidebar's chat list is loaded by the browser from /api/sidebar."""
+    # login_required already fetched the user, so rendering needs no extra backend call
+    from flask import g
+    return dict(
+        logged_in_user=getattr(g, 'user', None),
+        sidebar_user=cookie_key(session.get('api_cookies')),
+        sidebar_version=session.get('sidebar_version', 0),
+        now=datetime.now,
+        strptime=datetime.strptime
+    )
 
-        api = get_api_session()
-        try:
-            # If not already fetched (e.g. unprotected route or first time), fetch it
-            if not user_info:
-                user_resp = api.get(f"{API_BASE_URL}/@me")
-                if user_resp.ok:
-                    user_info = user_resp.json()
-                else:
-                    # If we fail here, and we ARE in a protected route, login_required would have caught it.
-                    # If we are in an UNProtected route (like /login), we just don't show user info.
-                    user_info = None
-
-            # Fetch chat history for the sidebar list
-            # We only do this if we have a valid user
-            chat_history = []
-            if user_info:
-                chat_resp = api.get(f"{API_BASE_URL}/list_sessions")
-                chat_history = chat_resp.json().get('sessions', []) if chat_resp.ok else []
-            
-            return dict(
-                logged_in_user=user_info,
-                chat_history=chat_history,
-                now=datetime.now,
-                strptime=datetime.strptime
-            )
-        except requests.exceptions.RequestException:
-            # API is down or unreachable
-            return dict(logged_in_user=None, chat_history=[], now=datetime.now, strptime=datetime.strptime)
-            
-    return dict(logged_in_user=None, chat_history=[], now=datetime.now, strptime=datetime.strptime)
+# GET endpoints whose responses the browser may cache, with their Cache-Control.
+# Pages are revalidated on every visit (their ETag turns repeats into a 304),
+# because flashes and redirects after POSTs must never show a stale copy.
+CACHEABLE_ENDPOINTS = {
+    'courses': 'private, no-cache',
+    'lesson_step': 'private, no-cache',
+    'api_course_chat': 'private, max-age=30',
+}
+
+@app.after_request
+def add_cache_headers(response):
+    """Adds Cache-Control and an ETag to cacheable GET responses, answering 304 when unchanged"""
+    cache_control = CACHEABLE_ENDPOINTS.get(request.endpoint)
+    if request.method != 'GET' or cache_control is None or response.status_code != 200 or response.is_streamed:
+        return response
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest())
+    return response.make_conditional(request)
 
 # --- Auth Routes (Proxy to API) ---
 
@@ -115,7 +455,7 @@ def login():
             return render_template("login.html")
 
         try:
-            api_session = requests.Session()
+            api_session = ApiSession()
 
             # Build payload dynamically — include whichever field is present
             payload = {"password": password}
@@ -124,16 +464,16 @@ def login():
             else:
                 payload["username"] = username
 
-            response = api_session.post(f"{API_BASE_URL}/login", json=payload)
+            response = api_session.post("/login", json=payload)
 
-            if response.ok:
+            if response.is_success:
                 # Save API's session cookies into the user's Flask session
-                session["api_cookies"] = api_session.cookies.get_dict()
+                session["api_cookies"] = dict(response.cookies)
                 return redirect(url_for("homepage"))
             else:
                 flash(response.json().get("error", "Invalid credentials"), "error")
 
-        except requests.exceptions.RequestException as e:
+        except API_ERRORS as e:
             flash(f"Error connecting to login service: {e}", "error")
 
     return render_template("login.html")
@@ -145,18 +485,18 @@ def register():
         email = request.form.get('email')
         password = request.form.get('password')
         try:
-            api_session = requests.Session()
+            api_session = ApiSession()
             response = api_session.post(
-                f"{API_BASE_URL}/register",
+                "/register",
                 json={"username": username, "email": email, "password": password}
             )
             if response.status_code == 201:
                 # Save cookies and log in
-                session['api_cookies'] = api_session.cookies.get_dict()
+                session['api_cookies'] = dict(response.cookies)
                 return redirect(url_for('complete_profile'))
             else:
                 flash(response.json().get("error", "Registration failed"), "error")
-        except requests.exceptions.RequestException as e:
+        except API_ERRORS as e:
             flash(f"Error connecting to registration service: {e}", "error")
     return render_template('register.html')
 
@@ -164,11 +504,12 @@ def register():
 def logout():
     """Logs the user out by proxying to API and clearing local session."""
     if 'api_cookies' in session:
-        try:
-            api = get_api_session()
-            api.post(f"{API_BASE_URL}/logout")
-        except requests.exceptions.RequestException:
-            pass  # Fail silently
+        invalidate_sidebar()
+        # Clearing our session already logs the user out here, so tell the
+        # backend in the background instead of making the redirect wait.
+        # Errors there fail silently.
+        api = get_api_session()
+        _BACKGROUND_POOL.submit(api.post, "/logout", timeout=httpx.Timeout(5.0, connect=2.0))
     session.clear()
     flash("You have been logged out.", "success")
     return redirect(url_for('login'))
@@ -185,14 +526,15 @@ def complete_profile():
         api = get_api_session()
         try:
             # We use the existing /user/update endpoint
-            resp = api.post(f"{API_BASE_URL}/user/update", json={"birthday": birthday})
+            resp = api.post("/user/update", json={"birthday": birthday})
             
-            if resp.ok:
+            if resp.is_success:
+                invalidate_sidebar()
                 flash("Profile updated! Welcome!", "success")
                 return redirect(url_for('homepage'))
             else:
                 flash(resp.json().get("error", "Failed to update profile"), "error")
-        except requests.exceptions.RequestException as e:
+        except API_ERRORS as e:
             flash(f"Error connecting to service: {e}", "error")
             
     return render_template('complete_profile.html')
@@ -226,9 +568,10 @@ def update_settings():
 
     api = get_api_session()
     try:
-        resp = api.post(f"{API_BASE_URL}/user/update", json=payload)
+        resp = api.post("/user/update", json=payload)
         
-        if resp.ok:
+        if resp.is_success:
+            invalidate_sidebar()
             if password:
                 # If password was updated, force logout
                 session.clear()
@@ -239,7 +582,7 @@ def update_settings():
         else:
             flash(resp.json().get("error", "Failed to update settings"), "error")
             
-    except requests.exceptions.RequestException as e:
+    except API_ERRORS as e:
         flash(f"Error connecting to service: {e}", "error")
 
     return redirect(url_for('user_settings'))
@@ -262,10 +605,10 @@ def chat_page(uid):
     """This page is for continuing an EXISTING chat."""
     api = get_api_session()
     try:
-        resp = api.get(f"{API_BASE_URL}/get_session/{uid}")
+        resp = api.get(GET_SESSION_PATH.format(uid=uid))
         resp.raise_for_status()
         chat_data = resp.json()
-    except requests.exceptions.RequestException:
+    except API_ERRORS:
         flash("Could not load chat session.", "error")
         return redirect(url_for('homepage'))
     return render_template('chat.html', chat_data=chat_data)
@@ -275,12 +618,10 @@ def chat_page(uid):
 def courses():
     api = get_api_session()
     try:
-        resp = api.get(f"{API_BASE_URL}/courses")
+        resp = api.get("/courses")
         resp.raise_for_status()
         course_list = resp.json()
-        for course in course_list:
-            course['image'] = f"https://placehold.co/600x400.png?text={requests.utils.quote(course.get('course_title', 'Course'))}"
-    except requests.exceptions.RequestException:
+    except API_ERRORS:
         course_list = []
         flash("Could not load courses from API.", "error")
     return render_template('courses.html', courses=course_list)
@@ -294,10 +635,11 @@ def generate_course():
         return redirect(url_for('courses'))
     api = get_api_session()
     try:
-        resp = api.post(f"{API_BASE_URL}/generate_course", json={"topic": topic})
+        resp = api.post("/generate_course", json={"topic": topic}, timeout=LLM_TIMEOUT)
         resp.raise_for_status()
+        invalidate_course()
         flash(f"Successfully generated course for '{topic}'!", "success")
-    except requests.exceptions.RequestException as e:
+    except API_ERRORS as e:
         flash(f"Error generating course: {e}", "error")
     return redirect(url_for('courses'))
 
@@ -309,7 +651,7 @@ def lessons(course_uid):
     to the 'lesson_step' route for it.
     """
     api = get_api_session()
-    course_data = get_course_data(api, course_uid)
+    course_data, _ = get_course_data(api, course_uid)
     
     if not course_data or not course_data.get('steps'):
         flash("Course not found or has no lessons.", "error")
@@ -325,15 +667,30 @@ def user_settings():
     """Fetches user data from the /@me endpoint."""
     api = get_api_session()
     try:
-        resp = api.get(f"{API_BASE_URL}/@me")
+        resp = api.get("/@me")
         resp.raise_for_status()
         user_data = resp.json()
-    except requests.exceptions.RequestException:
+    except API_ERRORS:
         user_data = {"username": "Error", "email": "Could not load data"}
     return render_template('user_settings.html', user=user_data)
 
 # --- API PROXY ENDPOINTS (for JavaScript) ---
 
+@app.route("/api/sidebar")
+def api_sidebar():
+    """Sidebar data (user + chat history), fetched by base.html after the page has rendered."""
+    if 'api_cookies' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    api = get_api_session()
+    try:
+        user_info, chat_history = _fetch_sidebar(api)
+    except (*API_ERRORS, FuturesTimeoutError):
+        # API is down, unreachable or too slow: show the last sidebar we had
+        user_info, chat_history = _stale_sidebar(api)
+    response = jsonify({"user": user_info, "chat_history": chat_history})
+    response.headers['Cache-Control'] = 'private, max-age=10'
+    return response
+
 @app.route("/api/new_chat", methods=["POST"])
 @login_required
 def api_new_chat():
@@ -342,17 +699,31 @@ def api_new_chat():
     if not message:
         return jsonify({"error": "No message provided"}), 400
     api = get_api_session()
+    global _COMBINED_NEW_CHAT
     try:
+        # Prefer the single-RPC endpoint; older backends answer 404/405 and we
+        # remember that so later chats go straight to the two-call path.
+        if _COMBINED_NEW_CHAT:
+            combined_resp = api.post("/create_session_with_message", json={"message": message}, stream=True, timeout=LLM_TIMEOUT)
+            if combined_resp.status_code in (404, 405):
+                combined_resp.close()
+                _COMBINED_NEW_CHAT = False
+            else:
+                raise_for_stream_status(combined_resp)
+                invalidate_sidebar()
+                return proxy_response(combined_resp)
+
         # 1. Create session
-        create_resp = api.post(f"{API_BASE_URL}/create_session")
+        create_resp = api.post("/create_session")
         create_resp.raise_for_status()
         uid = create_resp.json().get('uid')
-        # 2. Send first message
-        chat_resp = api.post(f"{API_BASE_URL}/chat", json={"uid": uid, "message": message})
-        chat_resp.raise_for_status()
+        # 2. Send first message (reuses the pooled connection from step 1)
+        chat_resp = api.post("/chat", json={"uid": uid, "message": message}, stream=True, timeout=LLM_TIMEOUT)
+        raise_for_stream_status(chat_resp)
+        invalidate_sidebar()
         # 3. Return the new chat info
-        return jsonify(chat_resp.json())
-    except requests.exceptions.RequestException as e:
+        return proxy_response(chat_resp)
+    except API_ERRORS as e:
         return jsonify({"error": f"API Error: {e}"}), 500
 
 @app.route("/api/chat/<string:uid>", methods=["POST"])
@@ -362,10 +733,11 @@ def api_chat(uid):
     message = data.get('message')
     api = get_api_session()
     try:
-        chat_resp = api.post(f"{API_BASE_URL}/chat", json={"uid": uid, "message": message})
-        chat_resp.raise_for_status()
-        return jsonify(chat_resp.json())
-    except requests.exceptions.RequestException as e:
+        chat_resp = api.post("/chat", json={"uid": uid, "message": message}, stream=True, timeout=LLM_TIMEOUT)
+        raise_for_stream_status(chat_resp)
+        invalidate_sidebar()
+        return proxy_response(chat_resp)
+    except API_ERRORS as e:
         return jsonify({"error": f"API Error: {e}"}), 500
 
 @app.route("/api/course_chat/<course_uid>/<int:step_number>", methods=["POST", "GET"])
@@ -377,22 +749,27 @@ def api_course_chat(course_uid, step_number):
         data = request.get_json()
         try:
             api_response = api.post(
-                f"{API_BASE_URL}/course/{course_uid}/step/{step_number}/chat", 
-                json=data
+                COURSE_STEP_CHAT_PATH.format(u=course_uid, s=step_number), 
+                json=data,
+                stream=True,
+                timeout=LLM_TIMEOUT
             )
-            api_response.raise_for_status()
-            return jsonify(api_response.json())
-        except requests.exceptions.RequestException as e:
+            raise_for_stream_status(api_response)
+            return proxy_response(api_response)
+        except API_ERRORS as e:
             return jsonify({"error": f"API Error: {e}"}), 500
 
     elif request.method == "GET":
         try:
-            api_response = api.get(
-                f"{API_BASE_URL}/course/{course_uid}/step/{step_number}/chat"
-            )
+            api_response = api.get(COURSE_STEP_CHAT_PATH.format(u=course_uid, s=step_number))
             api_response.raise_for_status()
-            return jsonify(api_response.json())
-        except requests.exceptions.RequestException as e:
+            # Buffered rather than streamed so add_cache_headers can give it an ETag
+            return Response(
+                api_response.content,
+                status=api_response.status_code,
+                content_type=api_response.headers.get('content-type', 'application/json')
+            )
+        except API_ERRORS as e:
             return jsonify({"error": f"API Error: {e}"}), 500
 
 @app.route("/lessons/<string:course_uid>/<int:step_number>")
@@ -400,48 +777,54 @@ def api_course_chat(course_uid, step_number):
 def lesson_step(course_uid, step_number):
     api = get_api_session()
     
-    # 1. Get full course data (for the sidebar)
-    course_data = get_course_data(api, course_uid)
+    # 1. Get full course data (for the sidebar) and the lesson history,
+    # in a single call when the backend supports it
+    bundle = get_lesson_bundle(api, course_uid, step_number)
+    if bundle:
+        course_data, steps_by_number, history_data = bundle
+    else:
+        (course_data, steps_by_number), history_data = get_course_data(api, course_uid), None
     if not course_data:
         flash("Course not found.", "error")
         return redirect(url_for('courses'))
 
     # 2. Find the specific step we are on
-    current_step = next((step for step in course_data.get('steps', []) if step['step_number'] == step_number), None)
+    current_step = steps_by_number.get(step_number)
     if not current_step:
         flash(f"Lesson {step_number} not found.", "error")
         return redirect(url_for('lessons', course_uid=course_uid))
 
-    # 3. Check lesson status (started or not)
-    try:
-        resp = api.get(f"{API_BASE_URL}/course/{course_uid}/step/{step_number}/chat")
-        
-        if resp.status_code == 200:
-            # 4a. History exists -> render chat template
-            history_data = resp.json().get("history", [])
-            return render_template(
-                "lesson_chat.html",
-                course_uid=course_uid,
-                course_title=course_data.get('course_title', 'Course'),
-                steps=course_data.get('steps', []),
-                step=current_step,
-                active_step_number=step_number,
-                history=history_data
-            )
-        else:
-            # 4b. Not found (or other error) -> render 'not started' template
-            return render_template(
-                "lesson_not_started.html",
-                course_uid=course_uid,
-                course_title=course_data.get('course_title', 'Course'),
-                steps=course_data.get('steps', []),
-                step=current_step,
-                active_step_number=step_number
-            )
+    # 3. Check lesson status (started or not), unless the bundle already told us
+    if not bundle:
+        try:
+            resp = api.get(COURSE_STEP_CHAT_PATH.format(u=course_uid, s=step_number))
+            if resp.status_code == 200:
+                history_data = resp.json().get("history", [])
+        except API_ERRORS as e:
+            flash(f"Error loading lesson: {e}", "error")
+            return redirect(url_for('courses'))
 
-    except requests.exceptions.RequestException as e:
-        flash(f"Error loading lesson: {e}", "error")
-        return redirect(url_for('courses'))
+    if history_data is not None:
+        # 4a. History exists -> render chat template
+        return render_template(
+            "lesson_chat.html",
+            course_uid=course_uid,
+            course_title=course_data.get('course_title', 'Course'),
+            steps=course_data.get('steps', []),
+            step=current_step,
+            active_step_number=step_number,
+            history=history_data
+        )
+    else:
+        # 4b. Not found (or other error) -> render 'not started' template
+        return render_template(
+            "lesson_not_started.html",
+            course_uid=course_uid,
+            course_title=course_data.get('course_title', 'Course'),
+            steps=course_data.get('steps', []),
+            step=current_step,
+            active_step_number=step_number
+        )
 
 @app.route("/lessons/<course_uid>/<int:step_number>/start", methods=["POST"])
 @login_required
@@ -449,11 +832,13 @@ def start_lesson(course_uid, step_number):
     api = get_api_session()
     try:
         api_response = api.post(
-            f"{API_BASE_URL}/course/{course_uid}/step/{step_number}/chat",
-            json={"start": True}
+            COURSE_STEP_CHAT_PATH.format(u=course_uid, s=step_number),
+            json={"start": True},
+            timeout=LLM_TIMEOUT
         )
         api_response.raise_for_status()
-    except requests.exceptions.RequestException as e:
+        invalidate_course(course_uid)
+    except API_ERRORS as e:
         flash(f"Error starting lesson: {e}", "error")
         
     # After POSTing, redirect back to the GET route for the same step
@@ -468,7 +853,7 @@ def calibrate_camera(course_uid):
     api = get_api_session()
     
     # We still need course data to populate the sidebar
-    course_data = get_course_data(api, course_uid)
+    course_data, _ = get_course_data(api, course_uid)
     if not course_data:
         flash("Course not found.", "error")
         return redirect(url_for('courses'))
@@ -486,21 +871,21 @@ def calibrate_camera(course_uid):
 @login_required
 def take_exam(course_uid):
     api = get_api_session()
-    course_data = get_course_data(api, course_uid)
+    course_data, _ = get_course_data(api, course_uid)
     if not course_data:
         flash("Course not found.", "error")
         return redirect(url_for('courses'))
 
     # Fetch exam from Engine
     try:
-        resp = api.get(f"{API_BASE_URL}/course/{course_uid}/exam")
+        resp = api.get(COURSE_EXAM_PATH.format(u=course_uid))
         if resp.status_code == 200:
             exam_data = resp.json().get('exam')
             exam_uid = resp.json().get('exam_uid')
         else:
             flash("Exam not available yet.", "info")
             return redirect(url_for('courses'))
-    except requests.exceptions.RequestException:
+    except API_ERRORS:
         flash("Could not load exam data.", "error")
         return redirect(url_for('courses'))
 
@@ -515,16 +900,6 @@ def take_exam(course_uid):
         socket_url=MEDIAPIPE_BASE_URL
     )
 
-    return render_template(
-        "exam.html",
-        course_uid=course_uid,
-        exam_uid=exam_uid,
-        exam=exam_data,
-        course_title=course_data.get('course_title', 'Course'),
-        steps=course_data.get('steps', []),
-        active_step_number='exam'
-    )
-
 @app.route("/api/course/<string:course_uid>/exam/submit", methods=["POST"])
 @login_required
 def submit_exam_proxy(course_uid):
@@ -533,31 +908,32 @@ def submit_exam_proxy(course_uid):
     
     # Forward to Engine
     try:
-        resp = api.post(f"{API_BASE_URL}/course/{course_uid}/exam/submit", json=data)
+        resp = api.post(COURSE_EXAM_SUBMIT_PATH.format(u=course_uid), json=data, stream=True)
         if resp.status_code == 200:
-            return jsonify(resp.json())
+            return proxy_response(resp)
         else:
+            resp.close()
             return jsonify({"error": "Submission failed at engine"}), resp.status_code
-    except requests.exceptions.RequestException as e:
+    except API_ERRORS as e:
          return jsonify({"error": str(e)}), 500
 
 @app.route("/lessons/<string:course_uid>/score")
 @login_required
 def exam_score(course_uid):
     api = get_api_session()
-    course_data = get_course_data(api, course_uid)
+    course_data, _ = get_course_data(api, course_uid)
     if not course_data:
         flash("Course not found.", "error")
         return redirect(url_for('courses'))
     
     # Get username from API
     try:
-        user_resp = api.get(f"{API_BASE_URL}/@me")
-        if user_resp.ok:
+        user_resp = api.get("/@me")
+        if user_resp.is_success:
             username = user_resp.json().get('username', 'Student')
         else:
             username = 'Student'
-    except requests.exceptions.RequestException:
+    except API_ERRORS:
         username = 'Student'
     
     score = request.args.get('score', 0, type=int)
@@ -587,21 +963,21 @@ def google_auth():
         print("DEBUG: Missing credential")
         return jsonify({"success": False, "error": "Missing credential"}), 400
 
-    api_session = requests.Session()
+    api_session = ApiSession()
 
     try:
         # Forward credential to main backend ("real API" on :8080)
         print(f"DEBUG: Forwarding to backend: {API_BASE_URL}/auth/google")
         resp = api_session.post(
-            f"{API_BASE_URL}/auth/google",
+            "/auth/google",
             json={"credential": credential}
         )
         print(f"DEBUG: Backend response status: {resp.status_code}")
         print(f"DEBUG: Backend response content: {resp.text}")
 
-        if resp.ok:
+        if resp.is_success:
             # Save backend cookies into the frontend session
-            session["api_cookies"] = api_session.cookies.get_dict()
+            session["api_cookies"] = dict(resp.cookies)
             print("DEBUG: Login successful, session cookies saved")
             return jsonify({"success": True})
         else:
@@ -0,0 +1,12 @@
+# Production server settings: gunicorn -c gunicorn.conf.py app:app
+#
+# Every route is a thin proxy that mostly waits on the backend, so run
+# gevent workers: one worker serves many in-flight requests at once
+# instead of pinning a thread per request.
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+worker_class = "gevent"
+worker_connections = 1000
+timeout = 60  # generate_course and chat can take a while upstream
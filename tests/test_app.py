@@ -0,0 +1,158 @@
+import threading
+import time
+
+import httpx
+
+import app
+
+
+def test_concurrent_upstream_calls_overlap(monkeypatch):
+    """The circuit breaker must not serialize calls to the backend"""
+    def slow_send(request, stream=False):
+        time.sleep(0.5)
+        return httpx.Response(200, json={}, request=request)
+
+    monkeypatch.setattr(app._HTTP, "send", slow_send)
+    api = app.ApiSession({"sid": "abc"})
+    threads = [threading.Thread(target=api.get, args=("/@me",)) for _ in range(2)]
+
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - start < 0.9
+
+
+def test_breaker_fails_fast_after_repeated_failures(monkeypatch):
+    calls = []
+
+    def failing_send(request, stream=False):
+        calls.append(request)
+        raise httpx.ConnectError("down", request=request)
+
+    monkeypatch.setattr(app._HTTP, "send", failing_send)
+    monkeypatch.setattr(app, "_BREAKER", app.CircuitBreaker(fail_max=2, reset_timeout=60))
+    api = app.ApiSession()
+
+    for _ in range(2):
+        try:
+            api.get("/@me")
+        except httpx.ConnectError:
+            pass
+    try:
+        api.get("/@me")
+    except app.BackendUnavailable:
+        pass
+    else:
+        raise AssertionError("breaker should be open")
+    assert len(calls) == 2
+
+
+def test_redirects_keep_user_cookies(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("cookie"))
+        if request.url.path == "/courses":
+            return httpx.Response(308, headers={"location": "/courses/"})
+        return httpx.Response(200, json=[])
+
+    client = httpx.Client(base_url="http://backend", transport=httpx.MockTransport(handler))
+    client.cookies.jar.set_policy(app.DefaultCookiePolicy(allowed_domains=[]))
+    monkeypatch.setattr(app, "_HTTP", client)
+
+    response = app.ApiSession({"sid": "abc"}).get("/courses")
+
+    assert response.status_code == 200
+    assert seen == ["sid=abc", "sid=abc"]
+
+
+def test_sidebar_url_differs_per_user():
+    """The browser caches /api/sidebar, so two users on one browser must never share its URL"""
+    contexts = []
+    for cookies in ({"sid": "alice"}, {"sid": "bob"}):
+        with app.app.test_request_context("/home"):
+            app.session["api_cookies"] = cookies
+            contexts.append(app.inject_global_data())
+    assert contexts[0]["sidebar_version"] == contexts[1]["sidebar_version"]
+    assert contexts[0]["sidebar_user"] != contexts[1]["sidebar_user"]
+
+
+def _lesson_client(monkeypatch, routes):
+    """Test client logged in against a mock backend answering the given {path: response}"""
+    def handler(request):
+        if request.url.path == "/@me":
+            return httpx.Response(200, json={"username": "alice"})
+        return routes.get(request.url.path, httpx.Response(404, json={"error": "Not found"}))
+
+    client = httpx.Client(base_url="http://backend", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(app, "_HTTP", client)
+    monkeypatch.setattr(app, "_LESSON_BUNDLE", True)
+    monkeypatch.setattr(app, "_COURSE_CACHE", app.TTLCache(maxsize=10, ttl=60))
+    monkeypatch.setattr(app, "_COURSE_STALE", app.LRUCache(maxsize=10))
+
+    test_client = app.app.test_client()
+    with test_client.session_transaction() as flask_session:
+        flask_session["api_cookies"] = {"sid": "abc"}
+    return test_client
+
+
+COURSE = httpx.Response(200, json={"course_title": "Intro", "steps": [{"step_number": 1, "title": "A"}]})
+
+
+def test_bundle_route_missing_with_json_404_falls_back_and_disables_bundle(monkeypatch):
+    client = _lesson_client(monkeypatch, {
+        "/course/c1": COURSE,
+        "/course/c1/step/1/chat": httpx.Response(200, json={"history": []}),
+    })
+
+    response = client.get("/lessons/c1/1")
+
+    assert response.status_code == 200
+    assert app._LESSON_BUNDLE is False
+
+
+def test_bundle_404_for_missing_step_reports_lesson_not_found(monkeypatch):
+    client = _lesson_client(monkeypatch, {"/course/c1": COURSE})
+
+    response = client.get("/lessons/c1/9")
+
+    assert response.status_code == 302
+    assert response.location.endswith("/lessons/c1")
+    assert app._LESSON_BUNDLE is True
+
+
+def test_open_breaker_keeps_the_users_session(monkeypatch):
+    breaker = app.CircuitBreaker(fail_max=1, reset_timeout=60)
+    breaker.record_failure()
+    monkeypatch.setattr(app, "_BREAKER", breaker)
+    client = app.app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session["api_cookies"] = {"sid": "abc"}
+
+    response = client.get("/home")
+
+    assert response.status_code == 503
+    with client.session_transaction() as flask_session:
+        assert flask_session["api_cookies"] == {"sid": "abc"}
+
+
+def test_llm_read_timeouts_do_not_trip_the_breaker(monkeypatch):
+    def slow_llm(request, stream=False):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    monkeypatch.setattr(app._HTTP, "send", slow_llm)
+    monkeypatch.setattr(app, "_BREAKER", app.CircuitBreaker(fail_max=1, reset_timeout=60))
+
+    try:
+        app.ApiSession().post("/chat", json={}, timeout=app.LLM_TIMEOUT)
+    except httpx.ReadTimeout:
+        pass
+    app._BREAKER.before_call()  # still closed
+
+
+def test_secret_key_is_not_the_dev_key_when_imported():
+    """Without FLASK_SECRET_KEY, only the `python app.py` debug server may use the checked-in key"""
+    assert app.app.secret_key != b"ambalearn-dev-only-secret"